@@ -1,14 +1,43 @@
 import mysql.connector
+from mysql.connector import pooling
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+# Pool created lazily on first use; sized via MYSQL_POOL_SIZE (default 5).
+# Public so callers sizing their own concurrency (main.run_queries) can stay
+# within the pool: get_connection() raises immediately when it is exhausted
+# rather than blocking.
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Prefer the C-extension protocol implementation when it is
+        # installed; it cuts per-query packet parsing overhead versus the
+        # pure-Python fallback.
+        kwargs = dict(
+            pool_name="ragsql_pool",
+            pool_size=POOL_SIZE,
+            host=os.getenv("MYSQL_HOST"),
+            user=os.getenv("MYSQL_USER"),
+            password=os.getenv("MYSQL_PASSWORD"),
+            database=os.getenv("MYSQL_DATABASE")
+        )
+        try:
+            _pool = pooling.MySQLConnectionPool(use_pure=False, **kwargs)
+        except ImportError:
+            _pool = pooling.MySQLConnectionPool(use_pure=True, **kwargs)
+    return _pool
+
+
 def get_connection():
-    conn = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DATABASE")
-    )
-    return conn
+    """Borrow a connection from the shared pool.
+
+    Calling .close() on the returned connection hands it back to the pool
+    instead of tearing it down, so existing callers keep working unchanged.
+    """
+    return _get_pool().get_connection()
@@ -1,6 +1,13 @@
 import google.generativeai as genai
+import numpy as np
 from dotenv import load_dotenv
+import functools
+import hashlib
 import os
+import re
+import sqlite3
+import threading
+import time
 from typing import List, Tuple, Optional, Union
 
 load_dotenv()
@@ -9,96 +16,335 @@ load_dotenv()
 GEMINI_MODEL = "gemini-2.5-flash"  # Default model for all operations
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# Initialize model (singleton pattern)
-_model = None
+# ---------- Response cache ----------
+# Repeat queries rebuild the exact same prompt, so we can skip the Gemini
+# round-trip entirely (seconds of latency + API cost) with an exact-match cache.
+_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+_CACHE_TTL_SECONDS = 24 * 60 * 60  # answers expire after a day
+_WHITESPACE_RE = re.compile(r"\s+")
 
+
+class LLMCache:
+    """SQLite-backed exact-match cache for model responses.
+
+    Keys are SHA-256 hashes of (function name, model, normalized prompt) so the
+    cache survives restarts and is safe to share between the CLI and the
+    Streamlit app. Entries older than the TTL are dropped on read.
+    """
+
+    def __init__(self, path: str = _CACHE_PATH, ttl: int = _CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        # A single shared connection guarded by a lock: callers may hit the
+        # cache from worker threads (see main.run_queries).
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created_at INT)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Lowercase and collapse whitespace so trivially-different prompts share a key."""
+        return _WHITESPACE_RE.sub(" ", prompt.strip().lower())
+
+    @classmethod
+    def make_key(cls, fn_name: str, prompt: str) -> str:
+        normalized = cls.normalize_prompt(prompt)
+        return hashlib.sha256(f"{fn_name}|{GEMINI_MODEL}|{normalized}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if time.time() - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, int(time.time())),
+            )
+            self._conn.commit()
+
+
+_cache = LLMCache()
+
+# ---------- Semantic cache ----------
+# Paraphrased queries ("who is Asmi?" vs "tell me about Asmi") miss the
+# exact-match cache but should still reuse the prior answer. We embed prompts
+# with Gemini's embedding model and return the nearest cached response when it
+# is similar enough, turning a ~1-3s generation call into a <10ms lookup.
+_EMBED_MODEL = "text-embedding-004"
+_SEMANTIC_THRESHOLD = 0.92
+_SEMANTIC_MAX_ENTRIES = 256
+
+
+class SemanticCache:
+    """In-memory embedding-similarity cache over model responses.
+
+    Unit-normalized embeddings live in one contiguous (N, D) float32 matrix so
+    a lookup is a single matrix-vector product followed by argmax; prompts and
+    responses stay in parallel Python lists. When the cache is full the
+    least-frequently-used entry is evicted.
+    """
+
+    def __init__(self, threshold: float = _SEMANTIC_THRESHOLD, max_entries: int = _SEMANTIC_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Lookups and inserts arrive from worker threads (main.run_queries)
+        # and Streamlit script threads; the lock keeps the matrix and the
+        # parallel lists in sync so a hit can't return the wrong entry.
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._prompts: List[str] = []
+        self._responses: List[str] = []
+        self._hits: List[int] = []
+
+    @staticmethod
+    def _embed(prompt: str) -> Optional[np.ndarray]:
+        """Embed a prompt to a unit vector; None if the embedding call fails."""
+        try:
+            result = genai.embed_content(model=_EMBED_MODEL, content=LLMCache.normalize_prompt(prompt))
+            vec = np.asarray(result["embedding"], dtype=np.float32)
+        except Exception:
+            return None
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+
+    def get(self, prompt: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Look up the nearest cached response for a prompt.
+
+        Returns (response, embedding); response is None on a miss, and the
+        embedding is returned so a following add() doesn't re-embed.
+        """
+        query_vec = self._embed(prompt)
+        if query_vec is None:
+            return None, query_vec
+        with self._lock:
+            if self._matrix is None:
+                return None, query_vec
+            scores = self._matrix @ query_vec
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self._hits[best] += 1
+                return self._responses[best], query_vec
+        return None, query_vec
+
+    def add(self, prompt: str, response: str, embedding: Optional[np.ndarray] = None) -> None:
+        vec = embedding if embedding is not None else self._embed(prompt)
+        if vec is None:
+            return
+        with self._lock:
+            if len(self._responses) >= self.max_entries:
+                evict = self._hits.index(min(self._hits))
+                self._matrix = np.delete(self._matrix, evict, axis=0)
+                del self._prompts[evict], self._responses[evict], self._hits[evict]
+            row = vec.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack((self._matrix, row))
+            self._prompts.append(prompt)
+            self._responses.append(response)
+            self._hits.append(0)
+
+
+_semantic_cache = SemanticCache()
+
+
+def cached_call(fn=None, *, semantic: bool = False):
+    """Wrap a prompt -> text function with the exact-match cache.
+
+    On a hit the Gemini call is skipped entirely; on a miss the fresh response
+    is stored before being returned. With semantic=True, exact-cache misses
+    also consult the embedding-similarity cache before calling the model.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(prompt: str) -> str:
+            key = _cache.make_key(fn.__name__, prompt)
+            hit = _cache.get(key)
+            if hit is not None:
+                return hit
+            embedding = None
+            if semantic:
+                hit, embedding = _semantic_cache.get(prompt)
+                if hit is not None:
+                    return hit
+            text = fn(prompt)
+            _cache.set(key, text)
+            if semantic:
+                _semantic_cache.add(prompt, text, embedding)
+            return text
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+# ---------- Prompt prefixes ----------
+# Static instructions live in module-level constants so the prompt prefix is
+# byte-identical across calls; variable context/question is appended strictly
+# after it. Provider-side prefix caching only hits when the leading tokens
+# match exactly, so interpolating context mid-prompt would defeat it.
+ANSWER_PROMPT_PREFIX = """You are a helpful AI assistant. Use the context from the MySQL database that follows to answer the question concisely.
+Answer in natural language. Do not repeat raw tuples; summarize the most relevant record(s) as a short paragraph.
+
+"""
+
+SQL_PROMPT_PREFIX = """You are an expert MySQL assistant.
+Convert the natural language question that follows into a valid SQL query for a table named `people_info` with columns: name, age, company, role, background.
+Return only the SQL query, nothing else.
+
+"""
+
+# Full templates assembled once at import; per-call work is a single .format
+# that slots the variable parts in after the stable prefix.
+_ANSWER_PROMPT_TEMPLATE = ANSWER_PROMPT_PREFIX + "Context (structured):\n{context}\n\nQuestion: {question}"
+_SQL_PROMPT_TEMPLATE = SQL_PROMPT_PREFIX + "Question: {question}"
+
+@functools.lru_cache(maxsize=None)
 def get_model():
-    """Get or create the Gemini model instance."""
-    global _model
-    if _model is None:
-        _model = genai.GenerativeModel(GEMINI_MODEL)
-    return _model
+    """Get or create the Gemini model instance (memoized)."""
+    return genai.GenerativeModel(GEMINI_MODEL)
 
-def generate_answer(user_query: str, context: Union[str, List[Tuple]]) -> str:
-    """Generate a natural language answer using context from the database.
+@cached_call(semantic=True)
+def _generate_answer_text(prompt: str) -> str:
+    return get_model().generate_content(prompt).text
 
-    The context can be either a plain string or a list of DB tuples. If it's a list
-    of tuples we format them into readable records before sending to the model so
-    the LLM doesn't simply echo raw tuples.
+@cached_call
+def _generate_sql_text(prompt: str) -> str:
+    return get_model().generate_content(prompt).text
+
+@cached_call
+def _explain_sql_result_text(prompt: str) -> str:
+    return get_model().generate_content(prompt).text
+
+def _stream_generate(fn_name: str, prompt: str, semantic: bool = False):
+    """Yield response text chunks for a prompt, going through the caches.
+
+    Cache hits yield the stored text in one piece; misses stream chunks from
+    Gemini as they arrive and store the joined text afterwards, so streamed
+    and non-streamed calls share the same cache entries.
     """
+    key = _cache.make_key(fn_name, prompt)
+    hit = _cache.get(key)
+    if hit is not None:
+        yield hit
+        return
+    embedding = None
+    if semantic:
+        hit, embedding = _semantic_cache.get(prompt)
+        if hit is not None:
+            yield hit
+            return
+    pieces = []
+    try:
+        for chunk in get_model().generate_content(prompt, stream=True):
+            # safety-filtered chunks have no parts and .text raises on them
+            if not chunk.parts:
+                continue
+            if chunk.text:
+                pieces.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        # stream-time errors are raised lazily while the UI consumes the
+        # generator, outside run_query's try/except, so degrade to a message
+        # instead of letting them escape; the partial response isn't cached
+        yield f"⚠️ Error generating response: {e}"
+        return
+    text = "".join(pieces)
+    _cache.set(key, text)
+    if semantic:
+        _semantic_cache.add(prompt, text, embedding)
+
+# Expected table columns for people_info; rows longer than this fall back to colN
+_PEOPLE_COLS = ("id", "name", "age", "height", "weight", "company", "role", "background")
+
+def _build_answer_prompt(user_query: str, context: Union[str, List[Tuple]]) -> str:
+    """Build the generate_answer prompt from a query and string/tuple context."""
     # If context is structured (list of tuples), format into readable records
     if isinstance(context, list):
-        # Expected table columns for people_info: id, name, age, height, weight, company, role, background
-        cols = ["id", "name", "age", "height", "weight", "company", "role", "background"]
-        formatted_rows = []
-        for row in context:
-            # map available values to columns; if row shorter/longer, handle gracefully
-            items = []
-            for i, val in enumerate(row):
-                col = cols[i] if i < len(cols) else f"col{i}"
-                items.append(f"{col}: {val}")
-            formatted_rows.append(
-                ", ".join(items)
+        readable_context = "\n".join(
+            ", ".join(
+                f"{_PEOPLE_COLS[i] if i < len(_PEOPLE_COLS) else f'col{i}'}: {val}"
+                for i, val in enumerate(row)
             )
-        readable_context = "\n".join(formatted_rows)
+            for row in context
+        )
     else:
         readable_context = str(context)
 
-    prompt = f"""
-You are a helpful AI assistant. Use the following context from the MySQL database to answer the question concisely.
+    return _ANSWER_PROMPT_TEMPLATE.format(context=readable_context, question=user_query)
 
-Context (structured):
-{readable_context}
+def generate_answer(user_query: str, context: Union[str, List[Tuple]]) -> str:
+    """Generate a natural language answer using context from the database.
 
-Question: {user_query}
+    The context can be either a plain string or a list of DB tuples. If it's a list
+    of tuples we format them into readable records before sending to the model so
+    the LLM doesn't simply echo raw tuples.
+    """
+    return _generate_answer_text(_build_answer_prompt(user_query, context))
 
-Please answer in natural language. Do not repeat raw tuples; summarize the most relevant record(s) as a short paragraph.
-"""
+def generate_answer_stream(user_query: str, context: Union[str, List[Tuple]]):
+    """Streaming variant of generate_answer; yields text chunks as they arrive."""
+    return _stream_generate("_generate_answer_text", _build_answer_prompt(user_query, context), semantic=True)
 
-    model = get_model()
-    response = model.generate_content(prompt)
-    return response.text
+# Group 1 is the bare statement with fences/'sql' tag/outer whitespace removed.
+_SQL_SANITIZE_RE = re.compile(r"^\s*(?:```[^\n]*\n?)?(?:sql\s*\n)?(.*?)(?:\n```)?\s*$", re.S | re.I)
 
 def generate_sql(query: str) -> str:
     """Convert natural language to SQL query."""
-    prompt = f"""
-    You are an expert MySQL assistant. 
-    Convert the following natural language question into a valid SQL query 
-    for a table named `people_info` with columns: name, age, company, role, background.
-    
-    Question: {query}
-    Return only the SQL query, nothing else.
-    """
-    model = get_model()
-    response = model.generate_content(prompt)
-    
-    # Sanitize response: strip Markdown fences and language tags
-    sql_text = response.text.strip()
-    # remove triple-backtick fences if present
-    if sql_text.startswith("```"):
-        lines = sql_text.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        sql_text = "\n".join(lines).strip()
-    # remove an initial 'sql' language tag
-    if sql_text.lower().startswith("sql\n"):
-        sql_text = sql_text.split("\n", 1)[1].strip()
-    
+    prompt = _SQL_PROMPT_TEMPLATE.format(question=query)
+    # Sanitize response: one compiled match strips surrounding whitespace,
+    # Markdown fences and a leading 'sql' language tag
+    sql_text = _SQL_SANITIZE_RE.match(_generate_sql_text(prompt)).group(1)
     return sql_text.split(';')[0].strip() + ';'
 
 def explain_sql_result(result: List[Tuple], query: str) -> str:
     """Generate natural language explanation of SQL query results."""
     prompt = f"Based on this SQL result {result}, answer the question: {query}"
-    model = get_model()
-    response = model.generate_content(prompt)
-    return response.text
+    return _explain_sql_result_text(prompt)
+
+def explain_sql_result_stream(result: List[Tuple], query: str):
+    """Streaming variant of explain_sql_result; yields text chunks as they arrive."""
+    prompt = f"Based on this SQL result {result}, answer the question: {query}"
+    return _stream_generate("_explain_sql_result_text", prompt)
+
+def warm_up(block: bool = False) -> threading.Thread:
+    """Initialize the Gemini client off the request path.
+
+    Model instantiation and the models-metadata call otherwise happen lazily
+    inside the first user query. Runs in a daemon thread so startup isn't
+    blocked either; pass block=True to wait for it.
+    """
+    def _init():
+        try:
+            get_model()
+            list_available_models()
+        except Exception:
+            pass
+    thread = threading.Thread(target=_init, name="gemini-warmup", daemon=True)
+    thread.start()
+    if block:
+        thread.join()
+    return thread
+
+@functools.lru_cache(maxsize=1)
+def _list_models() -> List[str]:
+    # lru_cache doesn't store raised exceptions, so only successes stick
+    return [str(model.name) for model in genai.list_models()]
 
 def list_available_models() -> List[str]:
-    """List all available Gemini models for the configured API key."""
+    """List all available Gemini models for the configured API key.
+
+    Successful lookups are memoized for the process; failures are reported
+    but retried on the next call.
+    """
     try:
-        models = genai.list_models()
-        return [str(model.name) for model in models]
+        return _list_models()
     except Exception as e:
         return [f"Error listing models: {str(e)}"]
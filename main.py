@@ -1,10 +1,67 @@
-from db_config import get_connection
-from gemini_generator import generate_answer, generate_sql, explain_sql_result
+from db_config import get_connection, POOL_SIZE
+from gemini_generator import (
+    generate_answer,
+    generate_answer_stream,
+    generate_sql,
+    explain_sql_result,
+    explain_sql_result_stream,
+    warm_up,
+)
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import os
-from typing import List, Tuple, Any
+import threading
+import time
+import unicodedata
+from typing import List, Tuple, Any, Optional
 import re
 
 _STOPWORDS = {"who","is","what","the","a","an","of","in","on","at","for","to"}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=512)
+def _tokenize(query: str) -> Tuple[str, ...]:
+    """Split a query into search tokens, dropping stopwords and very short words.
+
+    Memoized so repeated or retried queries don't re-scan the same string.
+    """
+    return tuple(t for t in _TOKEN_RE.findall(query) if t.lower() not in _STOPWORDS and len(t) > 2)
+
+# Intent rules compiled once at import. Each `any(k in q ...)` chain used to be
+# a nest of Python-level substring scans rescanning the whole query per
+# keyword; a compiled pattern does each rule in one pass. Rules are checked in
+# order, so earlier rules keep priority (e.g. "names" beats "ages").
+# Cap on rows any list-style query pulls back; everything past this would only
+# bloat the prompt and the UI table anyway, and the cap lets MySQL stop
+# scanning early instead of materializing the full result
+_LIST_LIMIT = 200
+
+_INTENT_RULES = [
+    (re.compile(r"name|all the people", re.I),
+     f"SELECT id, name FROM people_info LIMIT {_LIST_LIMIT};", "list of names"),
+    (re.compile(r"compan(?:y|ies)", re.I),
+     f"SELECT DISTINCT company FROM people_info WHERE company IS NOT NULL AND company != '' LIMIT {_LIST_LIMIT};", "distinct companies"),
+    (re.compile(r"role", re.I),
+     f"SELECT DISTINCT role FROM people_info WHERE role IS NOT NULL AND role != '' LIMIT {_LIST_LIMIT};", "distinct roles"),
+    # ages only count as a list intent alongside an explicit list/show word
+    (re.compile(r"(?=.*age)(?=.*(?:list|show|names|just))", re.I | re.S),
+     f"SELECT id, name, age FROM people_info LIMIT {_LIST_LIMIT};", "names and ages"),
+    (re.compile(r"count|how many|total number|number of", re.I),
+     "SELECT COUNT(*) FROM people_info;", "count"),
+    (re.compile(r"sum of age|total age|total of ages|sum ages", re.I),
+     "SELECT SUM(age) FROM people_info;", "sum of ages"),
+    (re.compile(r"average age|avg age|average of ages|mean age", re.I),
+     "SELECT AVG(age) FROM people_info;", "average age"),
+    (re.compile(r"max age|maximum age|oldest", re.I),
+     "SELECT MAX(age) FROM people_info;", "maximum age"),
+    (re.compile(r"min age|minimum age|youngest", re.I),
+     "SELECT MIN(age) FROM people_info;", "minimum age"),
+]
+
+_ANALYTICAL_RE = re.compile(
+    r"how many|count|average|sum|total|rows|maximum|minimum|number of|age|salary", re.I
+)
 
 
 def parse_intent(query: str) -> dict:
@@ -15,59 +72,82 @@ def parse_intent(query: str) -> dict:
       - sql: SQL string to execute
       - explain: short description for summarization
     """
-    q = query.lower()
-
-    # LIST intents
-    if any(k in q for k in ("name", "names", "list names", "just tell me the names", "tell me the names", "all the people")):
-        return {"action": "sql", "sql": "SELECT id, name FROM people_info;", "explain": "list of names"}
-    if any(k in q for k in ("company", "companies", "list companies", "which companies")):
-        return {"action": "sql", "sql": "SELECT DISTINCT company FROM people_info WHERE company IS NOT NULL AND company != '';", "explain": "distinct companies"}
-    if any(k in q for k in ("role", "roles", "list roles", "what roles")):
-        return {"action": "sql", "sql": "SELECT DISTINCT role FROM people_info WHERE role IS NOT NULL AND role != '';", "explain": "distinct roles"}
-    if any(k in q for k in ("age", "ages", "list ages", "show ages")) and any(w in q for w in ("list", "show", "names", "just")):
-        return {"action": "sql", "sql": "SELECT id, name, age FROM people_info;", "explain": "names and ages"}
-
-    # AGGREGATE intents
-    # detect column mentions
-    if "count" in q or re.search(r"how many|total number|number of", q):
-        return {"action": "sql", "sql": "SELECT COUNT(*) FROM people_info;", "explain": "count"}
-    # sum of ages
-    if any(k in q for k in ("sum of age", "sum of ages", "total age", "total of ages", "sum ages")):
-        return {"action": "sql", "sql": "SELECT SUM(age) FROM people_info;", "explain": "sum of ages"}
-    if any(k in q for k in ("average age", "avg age", "average of ages", "mean age")):
-        return {"action": "sql", "sql": "SELECT AVG(age) FROM people_info;", "explain": "average age"}
-    if any(k in q for k in ("max age", "maximum age", "oldest")):
-        return {"action": "sql", "sql": "SELECT MAX(age) FROM people_info;", "explain": "maximum age"}
-    if any(k in q for k in ("min age", "minimum age", "youngest")):
-        return {"action": "sql", "sql": "SELECT MIN(age) FROM people_info;", "explain": "minimum age"}
-
+    for pattern, sql, explain in _INTENT_RULES:
+        if pattern.search(query):
+            return {"action": "sql", "sql": sql, "explain": explain}
     return {"action": None}
 
 # ---------- Query Type Detector ----------
 def detect_query_type(query: str) -> str:
-    analytical_keywords = [
-        "how many", "count", "average", "sum", "total",
-        "rows", "maximum", "minimum", "number of", "total number", "age", "salary"
-    ]
-    if any(word in query.lower() for word in analytical_keywords):
+    if _ANALYTICAL_RE.search(query):
         return "sql_query"
     return "retrieval"
 
+# In-memory membership filter over people_info's text columns. The table is
+# small, so we keep one lowercased blob of all searchable text: if a term does
+# not occur in the blob it cannot match any LIKE '%term%' predicate, and the
+# DB round-trips can be skipped entirely. Rebuilt at most every TTL.
+_INDEX_TTL_SECONDS = 300
+_index_blob = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents, mirroring MySQL's accent/case-insensitive collations.
+
+    LIKE '%Jose%' matches "José" under the default ai_ci collations, so the
+    membership check has to fold both sides the same way or it would wrongly
+    rule out accented rows.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _get_search_blob(cursor: Any) -> Optional[str]:
+    """Get (building or refreshing if needed) the case/accent-folded search blob.
+
+    Returns None if the blob can't be built, in which case callers should
+    fall through to normal DB queries.
+    """
+    global _index_blob, _index_built_at
+    with _index_lock:
+        if _index_blob is None or time.time() - _index_built_at > _INDEX_TTL_SECONDS:
+            try:
+                cursor.execute("SELECT name, company, role, background FROM people_info;")
+                parts = [str(v) for row in cursor.fetchall() for v in row if v is not None]
+            except Exception:
+                return None
+            _index_blob = _fold("\n".join(parts))
+            _index_built_at = time.time()
+        return _index_blob
+
+
 # ---------- Retrieve documents (RAG flow) ----------
 def retrieve_from_db(query: str, cursor: Any) -> List[Tuple]:
-    sql_query = """
+    sql_query = f"""
         SELECT * FROM people_info
         WHERE name LIKE %s
         OR company LIKE %s
         OR role LIKE %s
-        OR background LIKE %s;
+        OR background LIKE %s
+        LIMIT {_LIST_LIMIT};
     """
     # If user explicitly asks for names/list of people, run a focused SQL to get names
     normalized = query.lower()
     if ("name" in normalized or "names" in normalized) and any(k in normalized for k in ("all", "list", "tell", "show", "just")):
-        cursor.execute("SELECT id, name FROM people_info;")
+        cursor.execute(f"SELECT id, name FROM people_info LIMIT {_LIST_LIMIT};")
         return cursor.fetchall()
 
+    # Short-circuit: if neither the query nor any of its tokens occur anywhere
+    # in the table's text, no LIKE search below can match. Skipped for queries
+    # containing LIKE wildcards (% or _), which the membership check doesn't model.
+    if "%" not in query and "_" not in query:
+        blob = _get_search_blob(cursor)
+        if blob is not None:
+            if _fold(query) not in blob and not any(_fold(t) in blob for t in _tokenize(query)):
+                return []
+
     # Try a broad LIKE search first
     wildcard = f"%{query}%"
     cursor.execute(sql_query, (wildcard, wildcard, wildcard, wildcard))
@@ -76,22 +156,44 @@ def retrieve_from_db(query: str, cursor: Any) -> List[Tuple]:
     # If nothing found for the full query, try a fallback using tokens (strip punctuation/stopwords)
     if not results:
         # ignore very short tokens (like 'me') to avoid accidental substring matches
-        tokens = [t for t in re.findall(r"\w+", query) if t.lower() not in _STOPWORDS and len(t) > 2]
-        found = {}
-        for token in tokens:
-            w = f"%{token}%"
-            cursor.execute(sql_query, (w, w, w, w))
-            for row in cursor.fetchall():
-                # use first column (id) for deduplication when available
-                key = row[0] if len(row) > 0 else row
-                found[key] = row
-
-        # if we found matches via tokens, return them as a list
-        if found:
-            return list(found.values())
+        tokens = _tokenize(query)
+        if tokens:
+            # OR all token predicates into one statement: a single round-trip and
+            # table scan instead of one per token, and each row matches at most
+            # once so no client-side dedup is needed
+            clause = " OR ".join(
+                ["name LIKE %s OR company LIKE %s OR role LIKE %s OR background LIKE %s"] * len(tokens)
+            )
+            params = [f"%{t}%" for t in tokens for _ in range(4)]
+            cursor.execute(f"SELECT * FROM people_info WHERE {clause} LIMIT {_LIST_LIMIT};", params)
+            results = cursor.fetchall()
 
     return results
 
+def _retrieve_with_own_connection(user_query: str) -> List[Tuple]:
+    """retrieve_from_db on a pooled connection of its own, for use from a worker thread.
+
+    MySQL connections aren't thread-safe, so a speculative retrieval running
+    alongside other work needs its own. Errors just mean no fallback context.
+    """
+    try:
+        conn = get_connection()
+    except Exception:
+        # pool exhausted (or DB down): no fallback context, not an error
+        return []
+    try:
+        cursor = conn.cursor(prepared=True)
+        try:
+            return retrieve_from_db(user_query, cursor)
+        finally:
+            cursor.close()
+    except Exception:
+        return []
+    finally:
+        # always hand the slot back: pooled connections only return via close()
+        conn.close()
+
+
 # ---------- Execute SQL safely ----------
 def execute_sql(sql: str, cursor: Any) -> List[Tuple] | str:
     if not sql.lower().startswith("select"):
@@ -103,70 +205,101 @@ def execute_sql(sql: str, cursor: Any) -> List[Tuple] | str:
     except Exception as e:
         return f"⚠️SQL Error: {e}"
 
+def _trivial_answer(result: List[Tuple], explain: str = "") -> Optional[str]:
+    """Deterministic phrasing for trivial SQL results, or None if the LLM is needed.
+
+    Empty results and single-value results (COUNT, SUM, AVG, ...) don't need a
+    generation call to be turned into a sentence.
+    """
+    if not result:
+        return "The query returned no rows."
+    if len(result) == 1 and len(result[0]) == 1:
+        value = result[0][0]
+        return f"The {explain} is {value}." if explain else f"The result is {value}."
+    return None
+
+
 # ---------- Main pipeline ----------
 def rag_pipeline(user_query: str) -> None:
     conn = get_connection()
-    cursor = conn.cursor()
+    # a pooled connection only goes back to the pool via close(), so everything
+    # after checkout runs under try/finally — a DB or Gemini error must not
+    # leak the slot
+    cursor = None
+    try:
+        cursor = conn.cursor()
+
+        query_type = detect_query_type(user_query)
 
-    query_type = detect_query_type(user_query)
+        if query_type == "retrieval":
+            # First check for explicit intents (lists, aggregates) that we can answer directly with SQL
+            intent = parse_intent(user_query)
+            if intent.get("action") == "sql":
+                sql = intent.get("sql")
+                print(f"\n--- Generated SQL ---\n{sql}")
+                result = execute_sql(sql, cursor)
+                print("\n--- SQL Query Result ---")
+                print(result)
+                # Summarize via explain_sql_result (uses LLM) unless trivial
+                if isinstance(result, list):
+                    answer = _trivial_answer(result, intent.get("explain", "")) or explain_sql_result(result, user_query)
+                    print("\n--- Model Answer ---")
+                    print(answer)
+                return
+
+            # prepared cursor: the parameterized LIKE statements are parsed once
+            # server-side and re-executed with fresh bindings
+            ret_cursor = conn.cursor(prepared=True)
+            try:
+                results = retrieve_from_db(user_query, ret_cursor)
+            finally:
+                ret_cursor.close()
+            if not results:
+                print("No relevant data found.")
+            else:
+                # Keep raw results (list of tuples) and also print a compact console view
+                context_results = results
+                readable = "\n".join(str(r) for r in results)
+                print("\n--- Retrieved Context ---")
+                print(readable)
+
+                # Ask the generator to summarize structured results (it will format nicely)
+                answer = generate_answer(user_query, context_results)
+                print("\n--- Model Answer ---")
+                print(answer)
 
-    if query_type == "retrieval":
-        # First check for explicit intents (lists, aggregates) that we can answer directly with SQL
-        intent = parse_intent(user_query)
-        if intent.get("action") == "sql":
-            sql = intent.get("sql")
+        elif query_type == "sql_query":
+            sql = generate_sql(user_query)  # Using centralized SQL generation
             print(f"\n--- Generated SQL ---\n{sql}")
             result = execute_sql(sql, cursor)
             print("\n--- SQL Query Result ---")
             print(result)
-            # Summarize via explain_sql_result (uses LLM)
+            # Generate natural language explanation of SQL results unless trivial
             if isinstance(result, list):
-                answer = explain_sql_result(result, user_query)
+                answer = _trivial_answer(result) or explain_sql_result(result, user_query)
                 print("\n--- Model Answer ---")
                 print(answer)
-            cursor.close()
-            conn.close()
-            return
-
-        results = retrieve_from_db(user_query, cursor)
-        if not results:
-            print("No relevant data found.")
-        else:
-            # Keep raw results (list of tuples) and also print a compact console view
-            context_results = results
-            readable = "\n".join(str(r) for r in results)
-            print("\n--- Retrieved Context ---")
-            print(readable)
-
-            # Ask the generator to summarize structured results (it will format nicely)
-            answer = generate_answer(user_query, context_results)
-            print("\n--- Model Answer ---")
-            print(answer)
-
-    elif query_type == "sql_query":
-        sql = generate_sql(user_query)  # Using centralized SQL generation
-        print(f"\n--- Generated SQL ---\n{sql}")
-        result = execute_sql(sql, cursor)
-        print("\n--- SQL Query Result ---")
-        print(result)
-        # Generate natural language explanation of SQL results
-        if isinstance(result, list):
-            answer = explain_sql_result(result, user_query)
-            print("\n--- Model Answer ---")
-            print(answer)
-
-    cursor.close()
-    conn.close()
-
-
-def run_query(user_query: str) -> dict:
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        conn.close()
+
+
+def run_query(user_query: str, stream: bool = False) -> dict:
     """Run the pipeline for a query and return structured results instead of printing.
 
+    With stream=True, model_answer is a generator of text chunks instead of a
+    full string, so the UI can render tokens as they arrive rather than
+    blocking on the complete response.
+
     Returns a dict containing keys that may include:
       - generated_sql: str or None
       - sql_result: list or str or None
       - retrieved_context: list of tuples or None
-      - model_answer: str or None
+      - model_answer: str, generator, or None
       - error: str if any error occurred
     """
     out = {
@@ -179,6 +312,15 @@ def run_query(user_query: str) -> dict:
 
     try:
         conn = get_connection()
+    except Exception as e:
+        out["error"] = str(e)
+        return out
+
+    # a pooled connection only goes back to the pool via close(), so everything
+    # after checkout runs under try/finally — a DB or Gemini error must not
+    # leak the slot
+    cursor = None
+    try:
         cursor = conn.cursor()
 
         query_type = detect_query_type(user_query)
@@ -191,35 +333,88 @@ def run_query(user_query: str) -> dict:
                 result = execute_sql(sql, cursor)
                 out["sql_result"] = result
                 if isinstance(result, list):
-                    out["model_answer"] = explain_sql_result(result, user_query)
-                cursor.close()
-                conn.close()
+                    trivial = _trivial_answer(result, intent.get("explain", ""))
+                    if trivial is not None:
+                        out["model_answer"] = trivial
+                    else:
+                        explain = explain_sql_result_stream if stream else explain_sql_result
+                        out["model_answer"] = explain(result, user_query)
                 return out
 
-            results = retrieve_from_db(user_query, cursor)
+            ret_cursor = conn.cursor(prepared=True)
+            try:
+                results = retrieve_from_db(user_query, ret_cursor)
+            finally:
+                ret_cursor.close()
             if not results:
                 out["model_answer"] = "No relevant data found."
             else:
                 out["retrieved_context"] = results
-                out["model_answer"] = generate_answer(user_query, results)
+                answer = generate_answer_stream if stream else generate_answer
+                out["model_answer"] = answer(user_query, results)
 
         elif query_type == "sql_query":
-            sql = generate_sql(user_query)
+            # generate_sql (Gemini) and a speculative retrieval (MySQL) hit
+            # different backends, so overlap them: the retrieval finishes well
+            # inside the LLM round-trip and is free fallback context in case
+            # the generated SQL doesn't pan out
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                sql_future = pool.submit(generate_sql, user_query)
+                retrieval_future = pool.submit(_retrieve_with_own_connection, user_query)
+                sql = sql_future.result()
             out["generated_sql"] = sql
             result = execute_sql(sql, cursor)
             out["sql_result"] = result
             if isinstance(result, list):
-                out["model_answer"] = explain_sql_result(result, user_query)
-
-        cursor.close()
-        conn.close()
+                trivial = _trivial_answer(result)
+                if trivial is not None:
+                    out["model_answer"] = trivial
+                else:
+                    explain = explain_sql_result_stream if stream else explain_sql_result
+                    out["model_answer"] = explain(result, user_query)
+            else:
+                # SQL was rejected or errored; the retrieval is already done
+                results = retrieval_future.result()
+                if results:
+                    out["retrieved_context"] = results
+                    answer = generate_answer_stream if stream else generate_answer
+                    out["model_answer"] = answer(user_query, results)
     except Exception as e:
         out["error"] = str(e)
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        conn.close()
 
     return out
 
+def run_queries(user_queries: List[str]) -> List[dict]:
+    """Run several queries concurrently and return their results in input order.
+
+    A Gemini call is latency-bound, not throughput-bound, so when a few queries
+    are queued up (e.g. several UI submissions in a row) issuing them together
+    finishes in roughly the time of the slowest one instead of their sum. Each
+    query still gets its own DB connection and cursor.
+    """
+    if not user_queries:
+        return []
+    if len(user_queries) == 1:
+        return [run_query(user_queries[0])]
+    # get_connection() raises rather than blocks when the pool is exhausted,
+    # and an analytical query holds two connections at once (its own cursor
+    # plus the speculative retrieval), so cap concurrency at half the pool
+    max_workers = min(len(user_queries), max(1, POOL_SIZE // 2))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(run_query, user_queries))
+
+
 # ---------- Run ----------
 if __name__ == "__main__":
+    # warm the Gemini client while the user is typing their query
+    warm_up()
     print("\nRAG + MySQL setup is working fine ✅")
     user_query = input("Enter your query: ")
     print(f"You entered: {user_query}")
@@ -1,15 +1,26 @@
 import streamlit as st
 from main import run_query
+from gemini_generator import warm_up
 
 st.set_page_config(page_title="RAG MySQL Explorer", layout="wide")
 
+
+@st.cache_resource
+def _warm_up_once():
+    # warm the Gemini client in the background at app start instead of
+    # paying the initialization inside the first query
+    return warm_up()
+
+
+_warm_up_once()
+
 st.title("RAG + MySQL Explorer")
 st.write("Ask questions about the `people_info` table. The app will either run SQL or retrieve and summarize records using the LLM.")
 
 query = st.text_input("Enter your query", placeholder="e.g. who is Asmi? or just list names")
 if st.button("Run") and query:
     with st.spinner("Running..."):
-        result = run_query(query)
+        result = run_query(query, stream=True)
 
     if result.get("error"):
         st.error(f"Error: {result['error']}")
@@ -30,11 +41,10 @@ if st.button("Run") and query:
                 import pandas as pd
                 # attempt to map columns: id, name, age, height, weight, company, role, background
                 cols = ["id", "name", "age", "height", "weight", "company", "role", "background"]
-                df_rows = []
-                for r in rows:
-                    rowdict = {cols[i]: r[i] if i < len(r) else None for i in range(len(cols))}
-                    df_rows.append(rowdict)
-                df = pd.DataFrame(df_rows)
+                # from_records builds the frame in one bulk call instead of a
+                # per-row dict loop; ragged rows are padded with NaN
+                df = pd.DataFrame.from_records(rows)
+                df.columns = [cols[i] if i < len(cols) else f"col{i}" for i in range(df.shape[1])]
                 st.dataframe(df)
             except Exception:
                 for r in rows:
@@ -42,7 +52,12 @@ if st.button("Run") and query:
 
         if result.get("model_answer"):
             st.subheader("Model Answer")
-            st.write(result["model_answer"]) 
+            answer = result["model_answer"]
+            # streamed answers arrive as a generator of chunks
+            if isinstance(answer, str):
+                st.write(answer)
+            else:
+                st.write_stream(answer)
 
 st.markdown("---")
 st.caption("Note: make sure your `.env` is configured and the virtualenv has the required packages. Run with: `streamlit run streamlit_app.py`")
\ No newline at end of file